@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Bus Route Analysis - Headless Pipeline Benchmark
+Generates synthetic bus_data.json-shaped datasets at several network scales,
+times and memory-profiles every stage of the analytics pipeline and compares
+the results against a stored baseline
+"""
+
+import argparse
+import contextlib
+import ctypes
+import gc
+import io
+import json
+import math
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')  # Headless rendering, must be set before pyplot is imported
+
+import generate_charts as pipeline
+
+BASELINE_FILE = Path("benchmarks/baseline.json")
+BASE_ROUTES = 208  # Size of today's network (1x scale)
+
+# Roughly the Baku network extent, used to place synthetic polylines
+CENTER_LAT, CENTER_LON = 40.4093, 49.8671
+KM_PER_DEG_LAT = 111.32
+KM_PER_DEG_LON = 111.32 * math.cos(math.radians(CENTER_LAT))
+
+TARIFFS = [40, 50, 60, 70, 80, 100, 150]
+PAYMENT_TYPES = [(1, 'Kart'), (2, 'Nağd'), (3, 'Kart və Nağd')]
+WORKING_ZONES = [(1, 'Şəhərdaxili'), (2, 'Şəhərətrafı'), (3, 'Rayonlararası')]
+
+CHART_STAGES = [
+    ('chart1_route_efficiency_ranking', pipeline.chart1_route_efficiency_ranking),
+    ('chart2_longest_journeys', pipeline.chart2_longest_journeys),
+    ('chart3_top_carriers', pipeline.chart3_top_carriers),
+    ('chart4_route_length_distribution', pipeline.chart4_route_length_distribution),
+    ('chart5_stop_density_analysis', pipeline.chart5_stop_density_analysis),
+    ('chart6_duration_vs_distance', pipeline.chart6_duration_vs_distance),
+    ('chart7_transport_hub_coverage', pipeline.chart7_transport_hub_coverage),
+    ('chart8_payment_methods', pipeline.chart8_payment_methods),
+    ('chart9_tariff_analysis', pipeline.chart9_tariff_analysis),
+    ('chart10_regional_coverage', pipeline.chart10_regional_coverage),
+    ('chart11_avg_stop_distance', pipeline.chart11_avg_stop_distance),
+    ('chart12_efficiency_matrix', pipeline.chart12_efficiency_matrix),
+]
+
+
+def _synthetic_polyline(rng, length_km, num_points):
+    """Random-walk polyline of roughly the requested length around the network center"""
+    step_km = length_km / max(num_points - 1, 1)
+    lat = CENTER_LAT + rng.uniform(-0.25, 0.25)
+    lon = CENTER_LON + rng.uniform(-0.35, 0.35)
+    heading = rng.uniform(0, 2 * math.pi)
+
+    coords = []
+    for seq in range(num_points):
+        coords.append({'lat': round(lat, 6), 'lon': round(lon, 6), 'sequence': seq})
+        heading += rng.gauss(0, 0.3)
+        lat += step_km * math.sin(heading) / KM_PER_DEG_LAT
+        lon += step_km * math.cos(heading) / KM_PER_DEG_LON
+    return coords
+
+
+def _synthetic_stops(rng, bus_id, polyline, length_km, num_stops, direction, next_stop_id):
+    """Stops placed along a polyline with monotonic totalDistance"""
+    stops = []
+    last_distance = 0.0
+    for i in range(num_stops):
+        fraction = i / max(num_stops - 1, 1)
+        point = polyline[int(fraction * (len(polyline) - 1))]
+        total_distance = round(fraction * length_km, 3)
+        stop_id = next_stop_id + i
+        code = f"{stop_id:06d}"
+        stops.append({
+            'id': bus_id * 10000 + direction * 1000 + i,
+            'stopCode': code,
+            'stopName': f"Stop {code}",
+            'totalDistance': total_distance,
+            'intermediateDistance': round(total_distance - last_distance, 3),
+            'directionTypeId': direction,
+            'busId': bus_id,
+            'stopId': stop_id,
+            'stop': {
+                'id': stop_id,
+                'code': code,
+                'name': f"Stop {code}",
+                'nameMonitor': f"Stop {code}",
+                'utmCoordX': '',
+                'utmCoordY': '',
+                'longitude': str(point['lon']),
+                'latitude': str(point['lat']),
+                'isTransportHub': rng.random() < 0.012,
+            },
+        })
+        last_distance = total_distance
+    return stops
+
+
+def iter_synthetic_buses(scale=1, seed=42, polyline_points=400):
+    """
+    Yield bus_data.json-shaped bus records for scale x today's route count
+    Args:
+        scale: Network size multiplier (1 = 208 routes)
+        seed: Random seed so every run benchmarks the same data
+        polyline_points: Average number of flow coordinates per route variant
+    """
+    rng = random.Random(seed)
+    num_buses = BASE_ROUTES * scale
+    # More cities bring more operators and regions, not just more routes
+    carriers = [f"Carrier {i} MMC" for i in range(1, 43 * scale + 1)]
+    regions = [(i, f"Region {i}") for i in range(1, 2 * scale + 1)]
+
+    next_stop_id = 1
+    for bus_id in range(1, num_buses + 1):
+        length_km = round(min(max(rng.lognormvariate(3.45, 0.55), 3.0), 140.0), 1)
+        speed_kmh = rng.uniform(36.0, 41.5)
+        duration_min = max(int(round(length_km / speed_kmh * 60)), 1)
+        stops_per_direction = max(int(length_km * rng.uniform(0.5, 1.2)), 4)
+        region_id, region_name = rng.choice(regions)
+        payment_id, payment_name = rng.choice(PAYMENT_TYPES)
+        zone_id, zone_name = rng.choice(WORKING_ZONES)
+        tariff = rng.choice(TARIFFS)
+
+        stops = []
+        routes = []
+        for direction in (1, 2):
+            num_points = max(int(rng.gauss(polyline_points, polyline_points * 0.25)), 2)
+            polyline = _synthetic_polyline(rng, length_km, num_points)
+            stops.extend(_synthetic_stops(rng, bus_id, polyline, length_km,
+                                          stops_per_direction, direction, next_stop_id))
+            next_stop_id += stops_per_direction
+            routes.append({
+                'id': bus_id * 10 + direction,
+                'code': f"{bus_id}-{direction}",
+                'customerName': 'BNA',
+                'type': 1,
+                'name': f"Route {bus_id} ({'forward' if direction == 1 else 'backward'})",
+                'destination': f"Terminal {bus_id}-{direction}",
+                'variant': 1,
+                'operator': rng.choice(carriers),
+                'busId': bus_id,
+                'directionTypeId': direction,
+                'flowCoordinates': polyline,
+            })
+
+        yield {
+            'id': bus_id,
+            'number': str(bus_id),
+            'carrier': rng.choice(carriers),
+            'firstPoint': f"Terminal {bus_id}-1",
+            'lastPoint': f"Terminal {bus_id}-2",
+            'routLength': length_km,
+            'durationMinuts': duration_min,
+            'tariff': tariff,
+            'tariffStr': f"{tariff / 100:.2f} AZN",
+            'region': {'id': region_id, 'name': region_name},
+            'paymentType': {'id': payment_id, 'name': payment_name},
+            'workingZoneType': {'id': zone_id, 'name': zone_name},
+            'stops': stops,
+            'routes': routes,
+        }
+
+
+def generate_synthetic_data(scale=1, seed=42, polyline_points=400):
+    """Synthetic dataset as an in-memory list, see iter_synthetic_buses"""
+    return list(iter_synthetic_buses(scale, seed=seed, polyline_points=polyline_points))
+
+
+def write_synthetic_data(path, scale=1, seed=42, polyline_points=400):
+    """
+    Stream a synthetic dataset to a JSON file one bus at a time, so the
+    generator never holds more than one record in memory
+    Returns: Dataset size figures
+    """
+    dataset = {'routes': 0, 'stops': 0, 'flow_coordinates': 0}
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for bus in iter_synthetic_buses(scale, seed=seed, polyline_points=polyline_points):
+            if dataset['routes']:
+                f.write(', ')
+            json.dump(bus, f, ensure_ascii=False)
+            dataset['routes'] += 1
+            dataset['stops'] += len(bus['stops'])
+            dataset['flow_coordinates'] += sum(len(r['flowCoordinates']) for r in bus['routes'])
+        f.write(']')
+
+    dataset['file_mb'] = round(Path(path).stat().st_size / (1024 * 1024), 2)
+    return dataset
+
+
+def _read_proc_status(field):
+    """Memory figure in MB from /proc/self/status, None where unavailable"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _release_free_memory():
+    """Hand freed heap pages back to the OS (glibc only) so RSS deltas are not hidden by reuse"""
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux only), returns whether it worked"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = _read_proc_status('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def _measure(func, *args, repeat=1, profile_memory=True):
+    """
+    Run func repeatedly and return its result with timing and memory figures
+    rss_peak_mb is the process RSS growth during the first timed run, which
+    includes native allocations such as Agg canvases. Where the peak counter
+    cannot be reset it is the growth of the lifetime peak, a lower bound.
+    py_heap_peak_mb is the tracemalloc peak of a separate run, since tracing
+    slows allocation-heavy code down considerably; it only sees the Python heap
+    Only one result is alive at a time so large stages are not held twice
+    """
+    timings = []
+    rss_peak_mb = None
+    result = None
+    for run in range(repeat):
+        result = None
+        gc.collect()
+        if run == 0:
+            _release_free_memory()
+            exact = _reset_peak_rss()
+            rss_before = _read_proc_status('VmRSS') if exact else _peak_rss_mb()
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+        if run == 0:
+            rss_after = _peak_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                rss_peak_mb = max(rss_after - rss_before, 0.0)
+
+    py_heap_peak_mb = None
+    if profile_memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        py_heap_peak_mb = peak / (1024 * 1024)
+
+    return result, {
+        'seconds': min(timings),
+        'rss_peak_mb': round(rss_peak_mb, 1) if rss_peak_mb is not None else None,
+        'py_heap_peak_mb': round(py_heap_peak_mb, 3) if py_heap_peak_mb is not None else None,
+    }
+
+
+def benchmark_scale(scale, seed=42, polyline_points=400, repeat=1, profile_memory=True):
+    """Benchmark every pipeline stage against a synthetic dataset of the given scale"""
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        data_file = tmp_dir / 'bus_data.json'
+        dataset = write_synthetic_data(data_file, scale, seed=seed,
+                                       polyline_points=polyline_points)
+
+        # Charts write into CHARTS_DIR, point it at the scratch directory
+        charts_dir = tmp_dir / 'charts'
+        charts_dir.mkdir()
+        original_charts_dir = pipeline.CHARTS_DIR
+        pipeline.CHARTS_DIR = charts_dir
+
+        try:
+            data, stages['load_data'] = _measure(pipeline.load_data, data_file,
+                                                 repeat=repeat, profile_memory=profile_memory)
+            df, stages['prepare_business_metrics'] = _measure(
+                pipeline.prepare_business_metrics, data,
+                repeat=repeat, profile_memory=profile_memory)
+            del data
+
+            for name, chart_func in CHART_STAGES:
+                # Charts may add columns to the frame, give each one a fresh copy
+                _, stages[name] = _measure(lambda: chart_func(df.copy()),
+                                           repeat=repeat, profile_memory=profile_memory)
+
+            _, stages['generate_summary_statistics'] = _measure(
+                pipeline.generate_summary_statistics, df,
+                repeat=repeat, profile_memory=profile_memory)
+        finally:
+            pipeline.CHARTS_DIR = original_charts_dir
+
+    return {'dataset': dataset, 'stages': stages}
+
+
+def _benchmark_scale_quietly(scale, **kwargs):
+    """benchmark_scale with the chatty pipeline output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return benchmark_scale(scale, **kwargs)
+
+
+def run_benchmarks(scales, seed=42, polyline_points=400, repeat=1, profile_memory=True):
+    """
+    Benchmark all requested scales and return a results document
+    A scale that fails, typically by running out of memory, is recorded as
+    {'error': ...} and larger scales are skipped, since they would fail too
+    """
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'polyline_points': polyline_points,
+        'repeat': repeat,
+        'scales': {},
+    }
+
+    failed_at = None
+    for scale in scales:
+        if failed_at is not None and scale > failed_at:
+            print(f"Skipping {scale}x, {failed_at}x already failed", flush=True)
+            results['scales'][str(scale)] = {'error': f"Skipped, {failed_at}x already failed"}
+            continue
+
+        print(f"Benchmarking {scale}x ({BASE_ROUTES * scale} routes)...", flush=True)
+        # A fresh process per scale keeps RSS figures independent and hands
+        # memory back to the OS before the next, larger scale starts
+        try:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(_benchmark_scale_quietly, scale, seed=seed,
+                                         polyline_points=polyline_points, repeat=repeat,
+                                         profile_memory=profile_memory)
+                results['scales'][str(scale)] = future.result()
+        except Exception as e:
+            # MemoryError from the worker, or BrokenProcessPool when the OOM killer took it
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            print(f"  ✗ {scale}x FAILED - {error}", flush=True)
+            results['scales'][str(scale)] = {'error': error}
+            failed_at = scale if failed_at is None else min(failed_at, scale)
+
+    return results
+
+
+# Parameters that change the workload, results are only comparable when they match
+COMPARABLE_PARAMETERS = ['seed', 'polyline_points', 'repeat']
+# Slowdowns smaller than this are timer noise, whatever their relative size (seconds)
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def failed_scales(results):
+    """Scales that did not finish, mapped to their error"""
+    return {scale: scale_results['error'] for scale, scale_results in results['scales'].items()
+            if 'error' in scale_results}
+
+
+def baseline_mismatches(results, baseline):
+    """Workload parameters that differ between results and a baseline"""
+    return [
+        f"{param}={results.get(param)!r} (baseline {baseline.get(param)!r})"
+        for param in COMPARABLE_PARAMETERS
+        if results.get(param) != baseline.get(param)
+    ]
+
+
+def print_report(results, baseline=None, threshold=0.25, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    Print per-stage timings and memory, flagging regressions against a baseline
+    Failed scales are listed with their error and left out of the comparisons
+    Returns: Number of stages that regressed by more than threshold and
+             by more than min_seconds
+    """
+    regressions = 0
+    for scale, scale_results in results['scales'].items():
+        if 'error' in scale_results:
+            print(f"\nScale {scale}x - {BASE_ROUTES * int(scale)} routes")
+            print("-" * 70)
+            print(f"  ✗ FAILED: {scale_results['error']}")
+            continue
+
+        dataset = scale_results['dataset']
+        print(f"\nScale {scale}x - {dataset['routes']} routes, {dataset['stops']} stops, "
+              f"{dataset['flow_coordinates']} flow coordinates, {dataset['file_mb']:.1f} MB")
+        print("-" * 70)
+        print(f"  {'Stage':<36} {'Time (s)':>10} {'RSS (MB)':>10} {'Heap (MB)':>10} {'vs base':>10}")
+
+        base_stages = {}
+        if baseline and scale in baseline.get('scales', {}):
+            base_stages = baseline['scales'][scale].get('stages', {})
+
+        for stage, measurement in scale_results['stages'].items():
+            rss = measurement['rss_peak_mb']
+            heap = measurement['py_heap_peak_mb']
+            rss_str = f"{rss:10.1f}" if rss is not None else f"{'-':>10}"
+            heap_str = f"{heap:10.1f}" if heap is not None else f"{'-':>10}"
+            change_str = f"{'-':>10}"
+            if stage in base_stages and base_stages[stage]['seconds'] > 0:
+                base_seconds = base_stages[stage]['seconds']
+                change = measurement['seconds'] / base_seconds - 1
+                change_str = f"{change:+10.0%}"
+                if change > threshold and measurement['seconds'] - base_seconds > min_seconds:
+                    regressions += 1
+                    change_str += " ⚠"
+            print(f"  {stage:<36} {measurement['seconds']:10.3f} {rss_str} {heap_str} {change_str}")
+
+        total = sum(m['seconds'] for m in scale_results['stages'].values())
+        print(f"  {'TOTAL':<36} {total:10.3f}")
+
+    print("\n  RSS: peak resident memory growth during the stage, including native")
+    print("  allocations. Heap: tracemalloc peak, Python objects only.")
+
+    # Show how each stage grows relative to the smallest scale benchmarked
+    scales = sorted((s for s in results['scales'] if 'error' not in results['scales'][s]), key=int)
+    if len(scales) > 1:
+        smallest = results['scales'][scales[0]]['stages']
+        print(f"\nScaling relative to {scales[0]}x (time ratio, linear = scale ratio)")
+        print("-" * 70)
+        header = ''.join(f"{s + 'x':>10}" for s in scales[1:])
+        print(f"  {'Stage':<36}{header}")
+        for stage, base in smallest.items():
+            ratios = ''
+            for scale in scales[1:]:
+                seconds = results['scales'][scale]['stages'][stage]['seconds']
+                ratios += f"{seconds / base['seconds']:10.1f}" if base['seconds'] > 0 else f"{'-':>10}"
+            print(f"  {stage:<36}{ratios}")
+
+    return regressions
+
+
+def _positive_int(value):
+    """argparse type for counts and multipliers that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value!r}")
+    return number
+
+
+def _scale_list(value):
+    """argparse type for a comma-separated list of positive scale multipliers"""
+    scales = [_positive_int(s.strip()) for s in value.split(',') if s.strip()]
+    if not scales:
+        raise argparse.ArgumentTypeError("needs at least one scale")
+    return scales
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the bus route analytics pipeline")
+    parser.add_argument('--scales', type=_scale_list, default='1,10,100',
+                        help="Comma-separated network scale multipliers (default: 1,10,100)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for synthetic data")
+    parser.add_argument('--polyline-points', type=_positive_int, default=400,
+                        help="Average flow coordinates per route variant")
+    parser.add_argument('--repeat', type=_positive_int, default=3,
+                        help="Timing runs per stage, the fastest is reported (default: 3)")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Skip the tracemalloc Python-heap run (RSS is still recorded)")
+    parser.add_argument('--baseline', default=str(BASELINE_FILE), help="Baseline results file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store these results as the new baseline")
+    parser.add_argument('--output', help="Also write results to this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Slowdown vs baseline reported as a regression (default: 0.25)")
+    parser.add_argument('--min-regression-seconds', type=float, default=MIN_REGRESSION_SECONDS,
+                        help="Slowdowns smaller than this are ignored as noise "
+                             f"(default: {MIN_REGRESSION_SECONDS})")
+    args = parser.parse_args()
+
+    scales = args.scales
+
+    print("=" * 70)
+    print("BUS ROUTE PIPELINE BENCHMARK")
+    print("=" * 70)
+
+    results = run_benchmarks(scales, seed=args.seed, polyline_points=args.polyline_points,
+                             repeat=args.repeat, profile_memory=not args.no_memory)
+
+    baseline_file = Path(args.baseline)
+    baseline = None
+    if baseline_file.exists() and not args.save_baseline:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatches = baseline_mismatches(results, baseline)
+        if mismatches:
+            print(f"\n⚠ Warning: Not comparing against {baseline_file}, the workload differs:")
+            for mismatch in mismatches:
+                print(f"    {mismatch}")
+            baseline = None
+        else:
+            print(f"\nComparing against baseline from {baseline['created']} ({baseline_file})")
+
+    regressions = print_report(results, baseline, threshold=args.threshold,
+                               min_seconds=args.min_regression_seconds)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to '{args.output}'")
+
+    if args.save_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Baseline saved to '{baseline_file}'")
+
+    failed = failed_scales(results)
+    if failed:
+        print(f"\n✗ {len(failed)} scale(s) did not finish: {', '.join(s + 'x' for s in failed)}")
+    if regressions:
+        print(f"\n⚠ {regressions} stage(s) slower than baseline by more than "
+              f"{args.threshold:.0%} and {args.min_regression_seconds}s")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Bus Route Analysis - Data Quality Scoring Engine
+Flattens scraped bus data into stop and polyline arrays once, runs vectorised
+quality rules over the whole dataset and scores every route from 0 to 100
+Gate: a route fails when it is critical (missing length/duration, implausible
+speed, or a coordinate or stop geometry rule saturated) or scores below the minimum score
+Output: Per-route quality table (CSV) and a JSON summary, non-zero exit when the gate fails
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+KM_PER_DEG = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+# Plausible average operating speed for a scheduled bus (km/h)
+MIN_SPEED_KMH = 8.0
+MAX_SPEED_KMH = 60.0
+# Stop further than this from its own polyline is off-route (km)
+MAX_STOP_OFFSET_KM = 0.3
+# A polyline step this many times longer than its variant's median step is a jump
+POLYLINE_JUMP_FACTOR = 10.0
+# Steps shorter than this are never jumps, however densely the variant is sampled (km)
+MIN_POLYLINE_JUMP_KM = 1.0
+# Consecutive stops closer than this are the same physical stop (km)
+DUPLICATE_STOP_KM = 0.005
+# Speed spread below this coefficient of variation suggests derived durations
+MIN_SPEED_CV = 0.05
+
+# Rule weights, a route failing every rule completely scores 0
+RULE_WEIGHTS = {
+    'missing_data': 30,
+    'implausible_speed': 20,
+    'missing_coordinates': 10,
+    'stops_off_route': 10,
+    'polyline_jumps': 10,
+    'duplicate_stops': 10,
+    'non_monotonic_distance': 10,
+}
+GEOMETRY_RULES = ['missing_coordinates', 'stops_off_route', 'polyline_jumps',
+                  'duplicate_stops', 'non_monotonic_distance']
+# Saturating one of these makes a route critical, polyline jumps only lower the
+# score since sparse but valid sampling is hard to tell apart from a gap
+CRITICAL_GEOMETRY_RULES = ['missing_coordinates', 'stops_off_route', 'duplicate_stops',
+                           'non_monotonic_distance']
+# Count-based rules reach full severity at this many offending items
+SATURATION_COUNT = 3
+# Default gate, routes scoring below this fail it
+MIN_QUALITY_SCORE = 80.0
+# Critical routes are rescaled into 0..CRITICAL_SCORE_CAP, below any sensible gate
+CRITICAL_SCORE_CAP = 60.0
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between coordinate arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _to_float(series):
+    """Numeric column with blanks and zero coordinates treated as missing"""
+    values = pd.to_numeric(series, errors='coerce').astype(float)
+    return values.where(values != 0)
+
+
+def flatten_dataset(data):
+    """
+    Flatten scraped bus data into three tables
+    Returns: (routes, stops, flow) DataFrames keyed by 'route_idx', the
+             position of the bus in the input list
+    """
+    route_rows = []
+    stop_rows = []
+    # Polylines dominate the data volume, collect them column-wise per variant
+    flow_columns = {'route_idx': [], 'variant_idx': [], 'direction': [],
+                    'sequence': [], 'lat': [], 'lon': []}
+    variant_idx = 0
+
+    for route_idx, bus in enumerate(data):
+        route_rows.append((route_idx, bus.get('id'), bus.get('number', 'N/A'),
+                           bus.get('routLength'), bus.get('durationMinuts')))
+
+        for order, stop in enumerate(bus.get('stops') or []):
+            info = stop.get('stop') or {}
+            stop_rows.append((route_idx, stop.get('directionTypeId'), order,
+                              stop.get('stopId', info.get('id')),
+                              info.get('latitude'), info.get('longitude'),
+                              stop.get('totalDistance')))
+
+        for variant in bus.get('routes') or []:
+            coords = variant.get('flowCoordinates') or []
+            count = len(coords)
+            flow_columns['route_idx'].extend([route_idx] * count)
+            flow_columns['variant_idx'].extend([variant_idx] * count)
+            flow_columns['direction'].extend([variant.get('directionTypeId')] * count)
+            flow_columns['sequence'].extend([c.get('sequence', seq) for seq, c in enumerate(coords)])
+            flow_columns['lat'].extend([c.get('lat') for c in coords])
+            flow_columns['lon'].extend([c.get('lon') for c in coords])
+            variant_idx += 1
+
+    routes = pd.DataFrame(route_rows, columns=['route_idx', 'bus_id', 'bus_number',
+                                               'route_length_km', 'duration_min'])
+    routes['route_length_km'] = pd.to_numeric(routes['route_length_km'], errors='coerce')
+    routes['duration_min'] = pd.to_numeric(routes['duration_min'], errors='coerce')
+
+    stops = pd.DataFrame(stop_rows, columns=['route_idx', 'direction', 'order', 'stop_id',
+                                             'lat', 'lon', 'total_distance'])
+    stops['lat'] = _to_float(stops['lat'])
+    stops['lon'] = _to_float(stops['lon'])
+    stops['total_distance'] = pd.to_numeric(stops['total_distance'], errors='coerce')
+
+    flow = pd.DataFrame(flow_columns)
+    flow['lat'] = _to_float(flow['lat'])
+    flow['lon'] = _to_float(flow['lon'])
+    flow = flow.sort_values(['variant_idx', 'sequence'], kind='stable').reset_index(drop=True)
+
+    return routes, stops, flow
+
+
+def _count_per_route(route_idx, num_routes):
+    """Number of flagged items per route"""
+    return np.bincount(np.asarray(route_idx, dtype=np.int64), minlength=num_routes)
+
+
+def check_missing_data(routes, stops, flow):
+    """
+    Missing length, duration, stops, stop coordinates or polyline per route
+    Returns: (missing item counts, whether length or duration is missing)
+    """
+    num_routes = len(routes)
+    has_stops = _count_per_route(stops['route_idx'], num_routes) > 0
+    stop_coords = stops.dropna(subset=['lat', 'lon'])['route_idx']
+    has_stop_coords = _count_per_route(stop_coords, num_routes) > 0
+    flow_coords = flow.dropna(subset=['lat', 'lon'])['route_idx']
+    has_flow_coords = _count_per_route(flow_coords, num_routes) > 0
+
+    no_length = (routes['route_length_km'].fillna(0) <= 0).to_numpy()
+    no_duration = (routes['duration_min'].fillna(0) <= 0).to_numpy()
+    missing = (no_length.astype(int) + no_duration.astype(int) + (~has_stops).astype(int)
+               + (~has_stop_coords).astype(int) + (~has_flow_coords).astype(int))
+    return missing, no_length | no_duration
+
+
+def check_missing_coordinates(stops, flow, num_routes):
+    """
+    Stops and flow coordinates with a blank or zero (null island) lat/lon per route
+    The geometry rules skip these points, so they are counted here instead
+    """
+    bad_stops = stops.loc[stops[['lat', 'lon']].isna().any(axis=1), 'route_idx']
+    bad_flow = flow.loc[flow[['lat', 'lon']].isna().any(axis=1), 'route_idx']
+    return (_count_per_route(bad_stops, num_routes)
+            + _count_per_route(bad_flow, num_routes))
+
+
+def check_speeds(routes, min_speed=MIN_SPEED_KMH, max_speed=MAX_SPEED_KMH):
+    """
+    Average speed per route and whether it is outside the plausible range
+    Routes without length or duration get NaN and are covered by missing_data
+    """
+    duration = routes['duration_min'].where(routes['duration_min'] > 0)
+    length = routes['route_length_km'].where(routes['route_length_km'] > 0)
+    speed = (length / duration * 60).to_numpy(float)
+    implausible = ~np.isnan(speed) & ((speed < min_speed) | (speed > max_speed))
+    return speed, implausible.astype(int)
+
+
+def _consecutive(frame, group_cols):
+    """Mask of rows that follow another row of the same group"""
+    same = np.ones(len(frame), dtype=bool)
+    same[0:1] = False
+    for col in group_cols:
+        values = frame[col].to_numpy()
+        same[1:] &= values[1:] == values[:-1]
+    return same
+
+
+def check_polyline_jumps(flow, num_routes, jump_factor=POLYLINE_JUMP_FACTOR,
+                         min_jump_km=MIN_POLYLINE_JUMP_KM):
+    """
+    Consecutive flow coordinates of the same variant further apart than
+    jump_factor times the variant's median step, and at least min_jump_km
+    Relative to the variant's own spacing, so sparsely sampled polylines are not flagged
+    """
+    if flow.empty:
+        return np.zeros(num_routes, dtype=int)
+    same = _consecutive(flow, ['variant_idx'])
+    lat = flow['lat'].to_numpy()
+    lon = flow['lon'].to_numpy()
+    step = np.full(len(flow), np.nan)
+    step[1:] = _haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    step[~same] = np.nan
+    median_step = pd.Series(step).groupby(flow['variant_idx'].to_numpy()).transform('median')
+    threshold = np.maximum(median_step.to_numpy() * jump_factor, min_jump_km)
+    jumps = same & (step > threshold)
+    return _count_per_route(flow['route_idx'].to_numpy()[jumps], num_routes)
+
+
+def check_stop_sequences(stops, num_routes, duplicate_km=DUPLICATE_STOP_KM):
+    """
+    Duplicate stops and decreasing totalDistance along each route direction
+    Returns: (duplicate counts, non-monotonic counts) per route
+    """
+    if stops.empty:
+        empty = np.zeros(num_routes, dtype=int)
+        return empty, empty
+
+    ordered = stops.sort_values(['route_idx', 'direction', 'order'], kind='stable')
+    same = _consecutive(ordered, ['route_idx', 'direction'])
+    route_idx = ordered['route_idx'].to_numpy()
+
+    # Same stop listed twice in a direction, or two stops at the same spot back to back
+    repeated_id = (ordered.duplicated(['route_idx', 'direction', 'stop_id'])
+                   & ordered['stop_id'].notna()).to_numpy()
+    lat = ordered['lat'].to_numpy()
+    lon = ordered['lon'].to_numpy()
+    gap = np.full(len(ordered), np.nan)
+    gap[1:] = _haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    stacked = same & (gap < duplicate_km)
+    duplicates = _count_per_route(route_idx[repeated_id | stacked], num_routes)
+
+    distance = ordered['total_distance'].to_numpy(float)
+    step = np.full(len(ordered), np.nan)
+    step[1:] = distance[1:] - distance[:-1]
+    decreasing = same & (step < 0)
+    non_monotonic = _count_per_route(route_idx[decreasing], num_routes)
+
+    return duplicates, non_monotonic
+
+
+def _segment_distance_km(lat, lon, start_lat, start_lon, end_lat, end_lon):
+    """
+    Distance from each point to its nearest segment on a local planar projection
+    Points are (S,) arrays, segments (P,) arrays, the work is one (S, P) pass
+    """
+    lon_scale = KM_PER_DEG * np.cos(np.radians(lat.mean()))
+    dx = (lon[:, None] - start_lon[None, :]) * lon_scale
+    dy = (lat[:, None] - start_lat[None, :]) * KM_PER_DEG
+    seg_dx = (end_lon - start_lon) * lon_scale
+    seg_dy = (end_lat - start_lat) * KM_PER_DEG
+    length_sq = seg_dx ** 2 + seg_dy ** 2
+    safe_length_sq = np.where(length_sq > 0, length_sq, 1.0)
+
+    t = np.clip((dx * seg_dx + dy * seg_dy) / safe_length_sq, 0, 1)
+    dx -= t * seg_dx
+    dy -= t * seg_dy
+    return np.sqrt((dx ** 2 + dy ** 2).min(axis=1))
+
+
+def check_stops_off_route(stops, flow, num_routes, max_offset_km=MAX_STOP_OFFSET_KM):
+    """
+    Stops further than max_offset_km from every polyline segment of their route
+    Stops are matched to the polylines of the same direction, falling back to
+    all polylines of the route when that direction has none
+    """
+    off_route = np.zeros(num_routes, dtype=int)
+    located = stops.dropna(subset=['lat', 'lon'])
+    coords = flow.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+    if located.empty or len(coords) < 2:
+        return off_route
+
+    same = _consecutive(coords, ['variant_idx'])
+    end_rows = np.flatnonzero(same)
+    segments = pd.DataFrame({
+        'route_idx': coords['route_idx'].to_numpy()[end_rows],
+        'direction': coords['direction'].to_numpy()[end_rows],
+        'row': end_rows,
+    })
+    lat = coords['lat'].to_numpy()
+    lon = coords['lon'].to_numpy()
+    stop_lat = located['lat'].to_numpy()
+    stop_lon = located['lon'].to_numpy()
+    segment_ends = segments['row'].to_numpy()
+    by_direction = segments.groupby(['route_idx', 'direction'], dropna=False).indices
+    by_route = segments.groupby('route_idx').indices
+
+    for (route_idx, direction), rows in located.groupby(['route_idx', 'direction'],
+                                                        dropna=False).indices.items():
+        seg_rows = by_direction.get((route_idx, direction))
+        if seg_rows is None:
+            seg_rows = by_route.get(route_idx)
+        if seg_rows is None:
+            continue
+        ends = segment_ends[seg_rows]
+        offsets = _segment_distance_km(stop_lat[rows], stop_lon[rows],
+                                       lat[ends - 1], lon[ends - 1], lat[ends], lon[ends])
+        off_route[route_idx] += int((offsets > max_offset_km).sum())
+
+    return off_route
+
+
+def score_dataset(data, min_speed=MIN_SPEED_KMH, max_speed=MAX_SPEED_KMH,
+                  max_stop_offset_km=MAX_STOP_OFFSET_KM,
+                  polyline_jump_factor=POLYLINE_JUMP_FACTOR):
+    """
+    Run every quality rule over the dataset
+    A route is critical when length or duration is missing, its speed is
+    implausible or a coordinate or stop geometry rule reaches SATURATION_COUNT
+    offending items.
+    Critical routes keep their relative order but are rescaled into
+    0..CRITICAL_SCORE_CAP, so a single critical problem fails the default gate
+    Returns: DataFrame with one row per bus, rule counts, a critical flag and
+             a 0-100 quality_score
+    """
+    routes, stops, flow = flatten_dataset(data)
+    num_routes = len(routes)
+
+    speed, implausible = check_speeds(routes, min_speed, max_speed)
+    duplicates, non_monotonic = check_stop_sequences(stops, num_routes)
+
+    report = routes[['bus_id', 'bus_number', 'route_length_km', 'duration_min']].copy()
+    report['avg_speed_kmh'] = speed
+    report['num_stops'] = _count_per_route(stops['route_idx'], num_routes)
+    report['missing_data'], missing_critical = check_missing_data(routes, stops, flow)
+    report['implausible_speed'] = implausible
+    report['missing_coordinates'] = check_missing_coordinates(stops, flow, num_routes)
+    report['stops_off_route'] = check_stops_off_route(stops, flow, num_routes, max_stop_offset_km)
+    report['polyline_jumps'] = check_polyline_jumps(flow, num_routes, polyline_jump_factor)
+    report['duplicate_stops'] = duplicates
+    report['non_monotonic_distance'] = non_monotonic
+
+    # Missing length or duration drops the route from the analysis, treat it as severe
+    severity = {
+        'missing_data': np.where(missing_critical, 1, np.minimum(report['missing_data'] / 2, 1)),
+        'implausible_speed': report['implausible_speed'],
+    }
+    for rule in GEOMETRY_RULES:
+        severity[rule] = np.minimum(report[rule] / SATURATION_COUNT, 1)
+
+    critical = missing_critical | (report['implausible_speed'] > 0).to_numpy()
+    for rule in CRITICAL_GEOMETRY_RULES:
+        critical |= (report[rule] >= SATURATION_COUNT).to_numpy()
+
+    penalty = sum(RULE_WEIGHTS[rule] * severity[rule] for rule in RULE_WEIGHTS)
+    score = 100 * (1 - penalty / sum(RULE_WEIGHTS.values()))
+    report['critical'] = critical
+    report['quality_score'] = np.where(critical, score * CRITICAL_SCORE_CAP / 100, score).round(1)
+    report['issues'] = [
+        ', '.join(rule for rule in RULE_WEIGHTS if row[rule])
+        for row in report[list(RULE_WEIGHTS)].to_dict('records')
+    ]
+
+    return report
+
+
+def failing_routes(report, min_score=MIN_QUALITY_SCORE):
+    """Mask of routes failing the gate: critical or scoring below min_score"""
+    return report['critical'] | (report['quality_score'] < min_score)
+
+
+def summarize(report, min_score=MIN_QUALITY_SCORE):
+    """Network-level quality summary for the JSON output"""
+    # Outliers are reported by implausible_speed, keep them out of the spread
+    speeds = report.loc[report['implausible_speed'] == 0, 'avg_speed_kmh'].dropna()
+    speed_cv = float(speeds.std() / speeds.mean()) if len(speeds) > 1 and speeds.mean() > 0 else None
+
+    return {
+        'total_routes': int(len(report)),
+        'mean_score': float(report['quality_score'].mean()) if len(report) else None,
+        'min_score': float(report['quality_score'].min()) if len(report) else None,
+        'critical_routes': int(report['critical'].sum()),
+        'routes_below_threshold': int((report['quality_score'] < min_score).sum()),
+        'routes_failing': int(failing_routes(report, min_score).sum()),
+        'threshold': min_score,
+        'routes_with_issue': {rule: int((report[rule] > 0).sum()) for rule in RULE_WEIGHTS},
+        'plausible_speed_range_kmh': [float(speeds.min()), float(speeds.max())] if len(speeds) else None,
+        'speed_cv': speed_cv,
+        'durations_look_derived': speed_cv is not None and speed_cv < MIN_SPEED_CV,
+    }
+
+
+def print_report(report, summary, worst=10):
+    """Print the quality summary and the lowest scoring routes"""
+    print("\nData Quality Summary:")
+    print(f"  Routes scored: {summary['total_routes']}")
+    if not summary['total_routes']:
+        return
+    print(f"  Mean score: {summary['mean_score']:.1f}")
+    print(f"  Critical routes: {summary['critical_routes']}")
+    print(f"  Routes below {summary['threshold']:.0f}: {summary['routes_below_threshold']}")
+    print(f"  Routes failing the gate: {summary['routes_failing']}")
+    print("\nRoutes with issues:")
+    for rule, count in summary['routes_with_issue'].items():
+        print(f"  {rule:<24} {count}")
+
+    if summary['durations_look_derived']:
+        low, high = summary['plausible_speed_range_kmh']
+        print(f"\n⚠ Warning: Speeds only span {low:.1f}-{high:.1f} km/h (CV {summary['speed_cv']:.3f}), "
+              f"durationMinuts looks derived from routLength rather than measured")
+
+    flagged = report[report['issues'] != ''].nsmallest(worst, 'quality_score')
+    if len(flagged):
+        print("\nLowest scoring routes:")
+        for _, row in flagged.iterrows():
+            print(f"  Bus {row['bus_number']:<8} {row['quality_score']:5.1f}  {row['issues']}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Score scraped bus data for quality issues")
+    parser.add_argument('--data', default='data/bus_data.json', help="Scraped bus data JSON file")
+    parser.add_argument('--output', default='data/quality_report.csv', help="Per-route quality table")
+    parser.add_argument('--min-score', type=float, default=MIN_QUALITY_SCORE,
+                        help=f"Routes scoring below this fail the gate, critical routes always "
+                             f"fail (default: {MIN_QUALITY_SCORE:.0f})")
+    parser.add_argument('--max-failures', type=int, default=0,
+                        help="Failing routes allowed before exiting non-zero")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("BUS DATA QUALITY CHECK")
+    print("=" * 70)
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    print(f"✓ Loaded data for {len(data)} bus routes")
+
+    report = score_dataset(data)
+    summary = summarize(report, args.min_score)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(output, index=False)
+    with open(output.with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print_report(report, summary)
+    print(f"\n✓ Quality report saved to '{output}'")
+
+    if summary['routes_failing'] > args.max_failures:
+        print(f"\n✗ Quality gate failed: {summary['routes_failing']} routes critical or "
+              f"below {args.min_score:.0f} (allowed: {args.max_failures})")
+        sys.exit(1)
+    print("\n✓ Quality gate passed")
+
+
+if __name__ == "__main__":
+    main()
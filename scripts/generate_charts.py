@@ -4,6 +4,7 @@ Bus Route Analysis - Business Intelligence Charts Generator
 Generates business-focused visualizations for executive decision-making
 """
 
+import argparse
 import json
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -24,10 +25,10 @@ plt.rcParams['axes.labelsize'] = 11
 CHARTS_DIR = Path("charts")
 CHARTS_DIR.mkdir(exist_ok=True)
 
-def load_data():
+def load_data(data_file='data/bus_data.json'):
     """Load bus data from JSON file"""
     print("Loading bus route data...")
-    with open('data/bus_data.json', 'r', encoding='utf-8') as f:
+    with open(data_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
     print(f"✓ Loaded data for {len(data)} bus routes\n")
     return data
@@ -454,18 +455,8 @@ def generate_summary_statistics(df):
     }
     return stats
 
-def main():
-    """Main execution function"""
-    print("=" * 70)
-    print("BUS ROUTE BUSINESS INTELLIGENCE ANALYSIS")
-    print("=" * 70)
-    print()
-
-    # Load and prepare data
-    data = load_data()
-    df = prepare_business_metrics(data)
-
-    # Generate all charts
+def generate_all_charts(df):
+    """Generate all business intelligence charts into CHARTS_DIR"""
     print("Generating business intelligence charts...")
     print("-" * 70)
 
@@ -485,12 +476,15 @@ def main():
     print("-" * 70)
     print(f"\n✓ All charts generated successfully in '{CHARTS_DIR}/' directory\n")
 
-    # Generate and save summary statistics
-    stats = generate_summary_statistics(df)
-    with open('charts/summary_stats.json', 'w') as f:
+def save_summary_statistics(stats):
+    """Save summary statistics next to the charts"""
+    stats_file = CHARTS_DIR / 'summary_stats.json'
+    with open(stats_file, 'w') as f:
         json.dump(stats, f, indent=2)
-    print("✓ Summary statistics saved to 'charts/summary_stats.json'\n")
+    print(f"✓ Summary statistics saved to '{stats_file}'\n")
 
+def print_key_metrics(stats):
+    """Print the headline KPIs"""
     print("=" * 70)
     print("ANALYSIS COMPLETE")
     print("=" * 70)
@@ -503,5 +497,33 @@ def main():
     print(f"  • Transport Hubs: {int(stats['total_hubs'])}")
     print()
 
+def main():
+    """Main execution function"""
+    global CHARTS_DIR
+
+    parser = argparse.ArgumentParser(description="Generate bus route business intelligence charts")
+    parser.add_argument('--data', default='data/bus_data.json', help="Scraped bus data JSON file")
+    parser.add_argument('--charts-dir', default=str(CHARTS_DIR), help="Output directory for charts")
+    args = parser.parse_args()
+
+    CHARTS_DIR = Path(args.charts_dir)
+    CHARTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 70)
+    print("BUS ROUTE BUSINESS INTELLIGENCE ANALYSIS")
+    print("=" * 70)
+    print()
+
+    # Load and prepare data
+    data = load_data(args.data)
+    df = prepare_business_metrics(data)
+
+    generate_all_charts(df)
+
+    # Generate and save summary statistics
+    stats = generate_summary_statistics(df)
+    save_summary_statistics(stats)
+    print_key_metrics(stats)
+
 if __name__ == "__main__":
     main()
@@ -9,7 +9,7 @@ Output: Single JSON file with all bus data
 import requests
 import json
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 
 
@@ -25,7 +25,8 @@ class BusScraper:
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36'
     }
 
-    def __init__(self, output_file: str = "data/bus_data.json"):
+    def __init__(self, output_file: str = "data/bus_data.json", base_url: Optional[str] = None):
+        self.base_url = base_url or self.BASE_URL
         self.output_file = Path(output_file)
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
         self.session = requests.Session()
@@ -38,7 +39,7 @@ class BusScraper:
         """
         print("Stage 1: Fetching bus list...")
         try:
-            response = self.session.get(f"{self.BASE_URL}/getBusList", timeout=30)
+            response = self.session.get(f"{self.base_url}/getBusList", timeout=30)
             response.raise_for_status()
             buses = response.json()
             print(f"✓ Found {len(buses)} buses")
@@ -54,7 +55,7 @@ class BusScraper:
         """
         try:
             response = self.session.get(
-                f"{self.BASE_URL}/getBusById",
+                f"{self.base_url}/getBusById",
                 params={"id": bus_id},
                 timeout=30
             )
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Bus Route Analysis - Sharded Multi-Region Pipeline
+Stage 1: Scrape, quality-gate and process every shard (region, city or agency) in parallel
+Stage 2: Merge the per-shard route metrics into network-wide statistics and charts
+Output: Per-shard intermediate files plus merged charts and summary statistics
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import matplotlib
+matplotlib.use('Agg')  # Headless rendering, must be set before pyplot is imported
+
+import pandas as pd
+
+import data_quality
+import generate_charts
+from scrape import BusScraper
+
+SHARDS_DIR = Path("data/shards")
+DEFAULT_SHARDS = [{'name': 'baku', 'base_url': BusScraper.BASE_URL}]
+# A shard fails when more than this share of its routes fail the quality gate
+MAX_FAILING_SHARE = 0.1
+
+# Text columns must survive the CSV round trip untouched (bus numbers like "007")
+TEXT_COLUMNS = ['shard', 'bus_number', 'carrier', 'region', 'payment_type',
+                'working_zone', 'first_point', 'last_point']
+
+
+def load_shard_config(config_file: str = None) -> List[Dict[str, Any]]:
+    """
+    Load shard definitions from a JSON file
+    Each shard needs a unique 'name' and either a 'base_url' to scrape
+    or a 'data_file' with already scraped bus data
+    """
+    if not config_file:
+        return DEFAULT_SHARDS
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        shards = json.load(f)
+
+    if not isinstance(shards, list) or not shards:
+        raise ValueError(f"Shard config {config_file!r} must be a non-empty JSON list")
+
+    names = set()
+    for shard in shards:
+        if not isinstance(shard, dict):
+            raise ValueError(f"Shard definition must be a JSON object: {shard!r}")
+        name = shard.get('name')
+        # Names become directories under the shards dir, '.' and '..' would escape it
+        if not isinstance(name, str) or not re.fullmatch(r'\w[\w.-]*', name):
+            raise ValueError(f"Invalid shard name: {name!r}")
+        if name in names:
+            raise ValueError(f"Duplicate shard name: {name!r}")
+        if not shard.get('base_url') and not shard.get('data_file'):
+            raise ValueError(f"Shard {name!r} needs a 'base_url' or a 'data_file'")
+        names.add(name)
+
+    return shards
+
+
+def process_shard(shard: Dict[str, Any], shards_dir: Path, scrape: bool = True,
+                  delay: float = 0.5, min_score: float = data_quality.MIN_QUALITY_SCORE,
+                  max_failing_share: float = MAX_FAILING_SHARE,
+                  exclude_failing: bool = True) -> Dict[str, Any]:
+    """
+    Scrape one shard, gate it on data quality and compute its per-route metrics
+    Routes failing the quality gate are dropped unless exclude_failing is off,
+    the shard only fails when more than max_failing_share of its routes do
+    Runs in a worker process, all output goes to the shard's pipeline.log
+    Returns: Shard name, route and quality counts and intermediate file locations
+    """
+    shard_dir = shards_dir / shard['name']
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    data_file = Path(shard.get('data_file') or shard_dir / 'bus_data.json')
+    metrics_file = shard_dir / 'metrics.csv'
+
+    # Outputs of an earlier run must not survive a failed one, --merge-only would pick them up
+    metrics_file.unlink(missing_ok=True)
+    (shard_dir / 'summary_stats.json').unlink(missing_ok=True)
+
+    with open(shard_dir / 'pipeline.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            if scrape and not shard.get('data_file'):
+                scraper = BusScraper(output_file=str(data_file), base_url=shard.get('base_url'))
+                data = scraper.scrape_all_buses(delay=delay)
+                if not data:
+                    raise RuntimeError(f"No data collected for shard {shard['name']!r}")
+                scraper.save_data(data)
+            else:
+                data = generate_charts.load_data(data_file)
+
+            # Score before metrics, which silently drop routes with missing data
+            quality = data_quality.score_dataset(data)
+            quality.insert(0, 'shard', shard['name'])
+            quality.to_csv(shard_dir / 'quality.csv', index=False)
+            quality_summary = data_quality.summarize(quality, min_score)
+            with open(shard_dir / 'quality.json', 'w', encoding='utf-8') as f:
+                json.dump(quality_summary, f, indent=2)
+            data_quality.print_report(quality, quality_summary)
+
+            failing = data_quality.failing_routes(quality, min_score).to_numpy()
+            excluded = 0
+            failing_share = failing.mean() if len(failing) else 0.0
+            if failing_share > max_failing_share:
+                raise RuntimeError(f"Quality gate failed: {quality_summary['routes_failing']} of "
+                                   f"{len(failing)} routes critical or below {min_score:.0f} "
+                                   f"({failing_share:.0%}, allowed: {max_failing_share:.0%})")
+            if exclude_failing and failing.any():
+                # Quality rows follow the order of the scraped bus list
+                data = [bus for bus, failed in zip(data, failing) if not failed]
+                excluded = int(failing.sum())
+
+            df = generate_charts.prepare_business_metrics(data)
+            del data
+            df.insert(0, 'shard', shard['name'])
+
+            df.to_csv(metrics_file, index=False)
+
+            stats = generate_charts.generate_summary_statistics(df) if len(df) else {'total_routes': 0}
+            with open(shard_dir / 'summary_stats.json', 'w') as f:
+                json.dump(stats, f, indent=2)
+        except Exception:
+            # The parent only reports the message, keep the full error in the shard log
+            traceback.print_exc(file=log)
+            raise
+
+    return {
+        'name': shard['name'],
+        'routes': len(df),
+        'mean_quality': quality_summary['mean_score'],
+        'failing_routes': quality_summary['routes_failing'],
+        'excluded_routes': excluded,
+        'metrics_file': str(metrics_file),
+    }
+
+
+def run_shards(shards: List[Dict[str, Any]], shards_dir: Path, scrape: bool = True,
+               delay: float = 0.5, workers: int = None,
+               min_score: float = data_quality.MIN_QUALITY_SCORE,
+               max_failing_share: float = MAX_FAILING_SHARE, exclude_failing: bool = True) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Process all shards in parallel
+    Every worker holds a whole shard in memory, so by default no more run
+    at once than there are CPUs
+    Returns: (names of the shards that completed successfully,
+              errors of the shards that failed by name)
+    """
+    print(f"Stage 1: Processing {len(shards)} shards...")
+    completed = []
+    failed = {}
+    workers = workers or min(len(shards), os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_shard, shard, shards_dir, scrape, delay,
+                            min_score, max_failing_share, exclude_failing): shard['name']
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+                completed.append(name)
+                quality = result['mean_quality']
+                quality_str = f", quality {quality:.1f}" if quality is not None else ""
+                print(f"  ✓ {name}: {result['routes']} routes{quality_str} -> {result['metrics_file']}")
+                if result['excluded_routes']:
+                    print(f"    ⚠ Warning: {result['excluded_routes']} routes failing the quality "
+                          f"gate excluded (see {shards_dir / name / 'quality.csv'})")
+                elif result['failing_routes']:
+                    print(f"    ⚠ Warning: {result['failing_routes']} routes failing the quality "
+                          f"gate kept (see {shards_dir / name / 'quality.csv'})")
+            except Exception as e:
+                failed[name] = str(e) or type(e).__name__
+                print(f"  ✗ {name} FAILED")
+                print(f"    Error: {e} (see {shards_dir / name / 'pipeline.log'})")
+                # Continue with other shards even if one fails
+
+    print(f"\n✓ Processed {len(completed)}/{len(shards)} shards")
+    return completed, failed
+
+
+def load_shard_metrics(shard_names: List[str], shards_dir: Path) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Combine the per-shard route metrics tables into one network-wide table
+    Returns: (metrics table, names of the shards whose metrics were found)
+    """
+    frames = []
+    loaded = []
+    for name in shard_names:
+        metrics_file = shards_dir / name / 'metrics.csv'
+        if not metrics_file.exists():
+            print(f"  ⚠ Warning: No metrics for shard {name!r}, skipping")
+            continue
+        frames.append(pd.read_csv(metrics_file, dtype={col: str for col in TEXT_COLUMNS},
+                                  keep_default_na=False))
+        loaded.append(name)
+
+    if not frames:
+        return pd.DataFrame(), loaded
+    return pd.concat(frames, ignore_index=True), loaded
+
+
+def merge_shards(shard_names: List[str], shards_dir: Path, charts_dir: Path,
+                 failed: Dict[str, str] = None) -> Dict[str, Any]:
+    """
+    Stage 2: Build network-wide charts and statistics from the shard metrics
+    Only the small per-route metrics tables are read, never the raw shard data
+    Failed shards and shards without metrics are listed in the per-shard
+    breakdown with status 'failed', so partial statistics say so
+    Returns: Merged summary statistics, or None when there are no routes to merge
+    """
+    print(f"\nStage 2: Merging {len(shard_names)} shards...")
+    df, loaded = load_shard_metrics(shard_names, shards_dir)
+    if df.empty:
+        return None
+    print(f"✓ Merged {len(df)} routes from {len(loaded)} shards\n")
+
+    # Bus numbers are only unique within a region or agency
+    if df['shard'].nunique() > 1:
+        df['bus_number'] = df['shard'] + ' ' + df['bus_number']
+
+    charts_dir.mkdir(parents=True, exist_ok=True)
+    generate_charts.CHARTS_DIR = charts_dir
+    generate_charts.generate_all_charts(df)
+
+    stats = generate_charts.generate_summary_statistics(df)
+    stats['shards'] = {}
+    for name in loaded:
+        # Shards that produced no routes still belong in the breakdown
+        group = df[df['shard'] == name]
+        stats['shards'][name] = {
+            'routes': int(len(group)),
+            'network_km': float(group['route_length_km'].sum()),
+            'stops': int(group['num_stops'].sum()),
+            'carriers': int(group['carrier'].nunique()),
+            'status': 'ok',
+        }
+    for name in shard_names:
+        if name not in loaded:
+            stats['shards'][name] = {'status': 'failed', 'error': "No metrics found"}
+    for name, error in (failed or {}).items():
+        stats['shards'][name] = {'status': 'failed', 'error': error}
+    generate_charts.save_summary_statistics(stats)
+    return stats
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Run the bus route pipeline over several shards")
+    parser.add_argument('--config', help="JSON file with shard definitions (default: Baku only)")
+    parser.add_argument('--shards-dir', default=str(SHARDS_DIR),
+                        help="Directory for per-shard intermediate files")
+    parser.add_argument('--charts-dir', default=str(generate_charts.CHARTS_DIR),
+                        help="Output directory for merged charts")
+    parser.add_argument('--workers', type=int,
+                        help="Parallel shard workers (default: one per shard, at most one per CPU)")
+    parser.add_argument('--delay', type=float, default=0.5, help="Delay between API requests")
+    parser.add_argument('--skip-scrape', action='store_true',
+                        help="Reuse each shard's existing bus_data.json instead of scraping")
+    parser.add_argument('--min-quality-score', type=float, default=data_quality.MIN_QUALITY_SCORE,
+                        help="Routes scoring below this fail the per-shard quality gate")
+    parser.add_argument('--max-failing-share', type=float, default=MAX_FAILING_SHARE,
+                        help="Share of failing routes above which the whole shard fails "
+                             f"(default: {MAX_FAILING_SHARE})")
+    parser.add_argument('--keep-failing-routes', action='store_true',
+                        help="Keep routes failing the quality gate in the metrics "
+                             "instead of dropping them")
+    parser.add_argument('--merge-only', action='store_true',
+                        help="Only merge existing shard metrics")
+    parser.add_argument('--allow-partial', action='store_true',
+                        help="Exit 0 even when some shards failed and the merge is partial")
+    args = parser.parse_args()
+
+    shards = load_shard_config(args.config)
+    shards_dir = Path(args.shards_dir)
+
+    print("=" * 70)
+    print("SHARDED BUS ROUTE PIPELINE")
+    print("=" * 70)
+    print()
+
+    if args.merge_only:
+        completed, failed = [shard['name'] for shard in shards], {}
+    else:
+        completed, failed = run_shards(shards, shards_dir, scrape=not args.skip_scrape,
+                               delay=args.delay, workers=args.workers,
+                               min_score=args.min_quality_score,
+                               max_failing_share=args.max_failing_share,
+                               exclude_failing=not args.keep_failing_routes)
+
+    if not completed:
+        print("\n✗ No shards processed. Exiting.")
+        sys.exit(1)
+
+    stats = merge_shards(completed, shards_dir, Path(args.charts_dir), failed)
+    if stats is None:
+        print("\n✗ No shard metrics to merge. Exiting.")
+        sys.exit(1)
+    generate_charts.print_key_metrics(stats)
+
+    failed_names = [name for name, shard in stats['shards'].items() if shard['status'] == 'failed']
+    if failed_names:
+        print(f"\n⚠ Warning: Statistics are partial, {len(failed_names)} shard(s) failed: "
+              f"{', '.join(failed_names)}")
+        if not args.allow_partial:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
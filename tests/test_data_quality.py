@@ -0,0 +1,99 @@
+import copy
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+import data_quality  # noqa: E402
+
+NUM_STOPS = 6
+NUM_POINTS = 21
+LENGTH_KM = 10.0
+
+
+def make_bus(bus_id=1):
+    """A clean eastbound route, stops sitting on its polyline"""
+    step_deg = LENGTH_KM / (NUM_POINTS - 1) / data_quality.KM_PER_DEG
+    polyline = [{'lat': 40.4, 'lon': 49.8 + i * step_deg, 'sequence': i} for i in range(NUM_POINTS)]
+
+    stops = []
+    for i in range(NUM_STOPS):
+        point = polyline[i * (NUM_POINTS - 1) // (NUM_STOPS - 1)]
+        stop_id = bus_id * 100 + i
+        stops.append({
+            'stopId': stop_id,
+            'directionTypeId': 1,
+            'totalDistance': round(i * LENGTH_KM / (NUM_STOPS - 1), 3),
+            'stop': {'id': stop_id, 'latitude': str(point['lat']), 'longitude': str(point['lon'])},
+        })
+
+    return {
+        'id': bus_id,
+        'number': str(bus_id),
+        'routLength': LENGTH_KM,
+        'durationMinuts': 30,
+        'stops': stops,
+        'routes': [{'directionTypeId': 1, 'flowCoordinates': polyline}],
+    }
+
+
+def score(bus):
+    return data_quality.score_dataset([make_bus(2), bus]).iloc[1]
+
+
+def test_clean_route_scores_full_marks():
+    report = data_quality.score_dataset([make_bus(1), make_bus(2)])
+    assert (report['quality_score'] == 100.0).all()
+    assert (report['issues'] == '').all()
+    assert not report['critical'].any()
+
+
+def test_null_island_stops_are_critical():
+    bus = make_bus()
+    for stop in bus['stops'][:3]:
+        stop['stop']['latitude'] = stop['stop']['longitude'] = '0'
+    row = score(bus)
+    assert row['missing_coordinates'] == 3
+    assert row['critical']
+    assert row['quality_score'] < data_quality.MIN_QUALITY_SCORE
+
+
+def test_blank_stop_coordinates_are_counted():
+    bus = make_bus()
+    bus['stops'][1]['stop']['latitude'] = ''
+    bus['stops'][2]['stop']['longitude'] = ''
+    row = score(bus)
+    assert row['missing_coordinates'] == 2
+    assert row['quality_score'] < 100.0
+
+
+def test_null_island_polyline_points_are_counted():
+    bus = make_bus()
+    for point in bus['routes'][0]['flowCoordinates'][5:15]:
+        point['lat'] = point['lon'] = 0
+    row = score(bus)
+    assert row['missing_coordinates'] == 10
+    assert row['critical']
+
+
+def test_missing_duration_is_critical():
+    bus = make_bus()
+    bus['durationMinuts'] = None
+    row = score(bus)
+    assert row['missing_data'] >= 1
+    assert row['critical']
+
+
+def test_sparse_polyline_is_not_a_jump():
+    bus = make_bus()
+    bus['routes'][0]['flowCoordinates'] = copy.deepcopy(bus['routes'][0]['flowCoordinates'][::4])
+    row = score(bus)
+    assert row['polyline_jumps'] == 0
+
+
+def test_teleporting_polyline_point_is_a_jump_but_not_critical():
+    bus = make_bus()
+    bus['routes'][0]['flowCoordinates'][10]['lat'] += 0.1
+    row = score(bus)
+    assert row['polyline_jumps'] == 2
+    assert not row['critical']